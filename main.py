@@ -1,151 +1,274 @@
 import os
-from fastapi import FastAPI, HTTPException
+from asyncio import current_task
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from cachetools import TTLCache
+from fastapi import FastAPI, HTTPException, Depends, Query
+from fastapi.middleware.gzip import GZipMiddleware
 from pydantic import BaseModel
-from sqlalchemy import create_engine, Column, Integer, String, Float, ForeignKey, DateTime
+from sqlalchemy import make_url, select, text, bindparam, Column, Integer, String, Float, ForeignKey, DateTime
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, async_scoped_session, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.orm import relationship
 from datetime import datetime
+from typing import List, Optional
 
 DATABASE_URL = os.getenv("DATABASE_URL")  # Render provides this
+# Render hands out a plain postgres URL; talk to it through the asyncpg driver
+ASYNC_DATABASE_URL = make_url(DATABASE_URL).set(drivername="postgresql+asyncpg")
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_size=20,
+    max_overflow=40,
+    pool_pre_ping=True,
+    pool_recycle=1800,
+    # Per-connection cache of asyncpg prepared statements, so Postgres parses and
+    # plans each hot query once per pooled connection rather than per request
+    connect_args={"prepared_statement_cache_size": 512},
+)
+SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+# Each request is served in its own asyncio task, so scoping by task gives one
+# session per request that anything on the request path can reach
+ScopedSession = async_scoped_session(SessionLocal, scopefunc=current_task)
 Base = declarative_base()
 
 # ---------- DATABASE MODELS ----------
+# Parent -> children collections are almost always read together, so they eager
+# load with selectin by default. Child -> parent back-refs raise instead of
+# lazy loading, which would be an accidental N+1 (and fails under AsyncSession).
 class Restaurant(Base):
     __tablename__ = "restaurants"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
     address = Column(String)
     phone = Column(String)
-    menu_categories = relationship("MenuCategory", back_populates="restaurant")
+    menu_categories = relationship("MenuCategory", back_populates="restaurant", lazy="selectin")
 
 class MenuCategory(Base):
     __tablename__ = "menu_categories"
-    id = Column(Integer, primary_key=True, index=True)
-    restaurant_id = Column(Integer, ForeignKey("restaurants.id"))
+    id = Column(Integer, primary_key=True)
+    restaurant_id = Column(Integer, ForeignKey("restaurants.id"), index=True)
     name = Column(String, nullable=False)
-    restaurant = relationship("Restaurant", back_populates="menu_categories")
-    menu_items = relationship("MenuItem", back_populates="category")
+    restaurant = relationship("Restaurant", back_populates="menu_categories", lazy="raise")
+    menu_items = relationship("MenuItem", back_populates="category", lazy="selectin")
 
 class MenuItem(Base):
     __tablename__ = "menu_items"
-    id = Column(Integer, primary_key=True, index=True)
-    category_id = Column(Integer, ForeignKey("menu_categories.id"))
+    id = Column(Integer, primary_key=True)
+    category_id = Column(Integer, ForeignKey("menu_categories.id"), index=True)
     name = Column(String, nullable=False)
     description = Column(String)
     price = Column(Float, nullable=False)
-    category = relationship("MenuCategory", back_populates="menu_items")
+    category = relationship("MenuCategory", back_populates="menu_items", lazy="raise")
 
 class Customer(Base):
     __tablename__ = "customers"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
     email = Column(String, unique=True)
     phone = Column(String)
 
 class Order(Base):
     __tablename__ = "orders"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     customer_id = Column(Integer, ForeignKey("customers.id"))
     restaurant_id = Column(Integer, ForeignKey("restaurants.id"))
     order_time = Column(DateTime, default=datetime.utcnow)
     status = Column(String, default="pending")
     total_amount = Column(Float)
-    items = relationship("OrderItem", back_populates="order")
+    items = relationship("OrderItem", back_populates="order", lazy="selectin")
 
 class OrderItem(Base):
     __tablename__ = "order_items"
-    id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"))
+    id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True)
     menu_item_id = Column(Integer, ForeignKey("menu_items.id"))
     quantity = Column(Integer, nullable=False)
     price = Column(Float, nullable=False)
-    order = relationship("Order", back_populates="items")
+    order = relationship("Order", back_populates="items", lazy="raise")
+
+# ---------- RESPONSE SCHEMAS ----------
+# Declared response models let FastAPI validate and dump straight to JSON bytes
+# in pydantic-core instead of walking dicts with jsonable_encoder.
+class RestaurantOut(BaseModel):
+    id: int
+    name: str
+    address: Optional[str] = None
+    phone: Optional[str] = None
+
+class MenuItemOut(BaseModel):
+    id: int
+    name: str
+    price: float
+
+class MenuCategoryOut(BaseModel):
+    category: str
+    items: List[MenuItemOut]
+
+# ----------------- Hot-path statements -----------------
+# Built once at import so every request reuses the same statement object and
+# hits SQLAlchemy's compiled-SQL cache straight away.
+# Plain column tuples: no ORM instances or identity-map bookkeeping. Keyset
+# pagination (id > after_id) walks the primary key index, unlike OFFSET.
+RESTAURANTS_STMT = (
+    select(Restaurant.id, Restaurant.name, Restaurant.address, Restaurant.phone)
+    .where(Restaurant.id > bindparam("after_id"))
+    .order_by(Restaurant.id)
+    .limit(bindparam("limit"))
+)
+# Whole menu as flat rows in one round-trip. Outer joins keep a row for a
+# restaurant with no categories (and categories with no items), so "no rows"
+# still means the restaurant does not exist.
+MENU_STMT = (
+    select(MenuCategory.id, MenuCategory.name, MenuItem.id, MenuItem.name, MenuItem.price)
+    .select_from(Restaurant)
+    .outerjoin(MenuCategory, MenuCategory.restaurant_id == Restaurant.id)
+    .outerjoin(MenuItem, MenuItem.category_id == MenuCategory.id)
+    .where(Restaurant.id == bindparam("rid"))
+    .order_by(MenuCategory.id, MenuItem.id)
+)
 
 # ----------------- 4. Create tables & insert sample data -----------------
-# Create tables
-Base.metadata.create_all(bind=engine)
+# Any fixed key works; it only has to be the same in every worker
+INIT_LOCK_KEY = 42
 
-# Insert sample data function
-def init_sample_data():
-    db = SessionLocal()
-    try:
-        # Only insert if no restaurant exists
-        if not db.query(Restaurant).first():
-            
-            # ---- Restaurants ----
-            r1 = Restaurant(name="Pizza Place", address="123 Main St", phone="1234567890")
-            r2 = Restaurant(name="Burger Corner", address="456 Side St", phone="9876543210")
-            db.add_all([r1, r2])
-            db.commit()
-            db.refresh(r1)
-            db.refresh(r2)
-
-            # ---- Categories ----
-            cat1 = MenuCategory(name="Pizza", restaurant_id=r1.id)
-            cat2 = MenuCategory(name="Drinks", restaurant_id=r1.id)
-            cat3 = MenuCategory(name="Burgers", restaurant_id=r2.id)
-            cat4 = MenuCategory(name="Drinks", restaurant_id=r2.id)
-            db.add_all([cat1, cat2, cat3, cat4])
-            db.commit()
-            db.refresh(cat1)
-            db.refresh(cat2)
-            db.refresh(cat3)
-            db.refresh(cat4)
-
-            # ---- Menu Items ----
-            items = [
-                MenuItem(name="Margherita", description="Cheese pizza", price=5.99, category_id=cat1.id),
-                MenuItem(name="Coke", description="Soft drink", price=1.5, category_id=cat2.id),
-                MenuItem(name="Veggie Burger", description="Tasty veggie burger", price=4.5, category_id=cat3.id),
-                MenuItem(name="Pepsi", description="Soft drink", price=1.5, category_id=cat4.id)
-            ]
-            db.add_all(items)
-            db.commit()
-
-            # ---- Customer ----
-            customer = Customer(name="Sindhur", email="sindhur@example.com", phone="1122334455")
-            db.add(customer)
-            db.commit()
-
-            print("Sample data inserted successfully. ✅")
-    finally:
-        db.close()
+# create_all never adds indexes to tables that already exist, so databases created
+# before the index changes get them here: add the foreign-key indexes declared on
+# the models and drop the old duplicate ix_<table>_id primary-key indexes.
+async def migrate_indexes(conn):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            await conn.execute(CreateIndex(index, if_not_exists=True))
+    await conn.execute(text(
+        "DROP INDEX IF EXISTS "
+        + ", ".join(f"ix_{t.name}_id" for t in Base.metadata.sorted_tables)
+    ))
+
+# Insert sample data function. Rows carry fixed primary keys, so every table is
+# one executemany of plain dicts with no RETURNING needed to wire up foreign keys.
+async def init_sample_data(conn):
+    # Only insert if no restaurant exists
+    if (await conn.execute(select(Restaurant.id).limit(1))).first():
+        return
+
+    # ---- Restaurants ----
+    await conn.execute(insert(Restaurant).on_conflict_do_nothing(), [
+        {"id": 1, "name": "Pizza Place", "address": "123 Main St", "phone": "1234567890"},
+        {"id": 2, "name": "Burger Corner", "address": "456 Side St", "phone": "9876543210"},
+    ])
+
+    # ---- Categories ----
+    await conn.execute(insert(MenuCategory).on_conflict_do_nothing(), [
+        {"id": 1, "name": "Pizza", "restaurant_id": 1},
+        {"id": 2, "name": "Drinks", "restaurant_id": 1},
+        {"id": 3, "name": "Burgers", "restaurant_id": 2},
+        {"id": 4, "name": "Drinks", "restaurant_id": 2},
+    ])
+
+    # ---- Menu Items ----
+    await conn.execute(insert(MenuItem).on_conflict_do_nothing(), [
+        {"id": 1, "name": "Margherita", "description": "Cheese pizza", "price": 5.99, "category_id": 1},
+        {"id": 2, "name": "Coke", "description": "Soft drink", "price": 1.5, "category_id": 2},
+        {"id": 3, "name": "Veggie Burger", "description": "Tasty veggie burger", "price": 4.5, "category_id": 3},
+        {"id": 4, "name": "Pepsi", "description": "Soft drink", "price": 1.5, "category_id": 4},
+    ])
+
+    # ---- Customer ----
+    await conn.execute(
+        insert(Customer)
+        .values(id=1, name="Sindhur", email="sindhur@example.com", phone="1122334455")
+        .on_conflict_do_nothing()
+    )
 
-# Call this function once at app startup
-init_sample_data()
+    # Explicit ids bypass the serial sequences; move them past the seeded rows
+    # (all four in one statement) so later inserts don't collide
+    await conn.execute(text(
+        "SELECT "
+        + ", ".join(
+            f"setval(pg_get_serial_sequence('{t}', 'id'), (SELECT max(id) FROM {t}))"
+            for t in ("restaurants", "menu_categories", "menu_items", "customers")
+        )
+    ))
+
+    print("Sample data inserted successfully. ✅")
+
+# Create tables and seed once at app startup; dispose the pool on shutdown.
+# Every worker runs this, so the transaction-scoped advisory lock makes them take
+# turns: the first one creates and seeds, the rest find the data and move on.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with engine.begin() as conn:
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": INIT_LOCK_KEY})
+        await conn.run_sync(Base.metadata.create_all)
+        await migrate_indexes(conn)
+        await init_sample_data(conn)
+    yield
+    await engine.dispose()
 
 # ----------------- 5. FastAPI app -----------------
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+# List payloads are repetitive JSON; small bodies are not worth compressing
+app.add_middleware(GZipMiddleware, minimum_size=500, compresslevel=5)
+
+# ----------------- Response caches -----------------
+# Restaurants and menus change rarely, so hot reads are served from memory for
+# a short TTL. Routes run on the event loop, so no locking is needed.
+CACHE_TTL = 60
+restaurants_cache = TTLCache(maxsize=128, ttl=CACHE_TTL)
+menu_cache = TTLCache(maxsize=1024, ttl=CACHE_TTL)
+
+# One pooled session per request; remove() closes it and clears the task's slot
+async def get_db():
+    try:
+        yield ScopedSession()
+    finally:
+        await ScopedSession.remove()
 
 # ----------------- 6. Endpoints -----------------
+# Ids are Integer (int4) columns; asyncpg refuses to bind anything larger
+INT4_MAX = 2**31 - 1
+
 @app.get("/")
-def health():
+async def health():
     return {"message": "API is running ✅"}
 
-@app.get("/restaurants")
-def get_restaurants():
-    db = SessionLocal()
-    try:
-        data = [{"id": r.id, "name": r.name, "address": r.address, "phone": r.phone} 
-                for r in db.query(Restaurant).all()]
-        return data
-    finally:
-        db.close()
+@app.get("/restaurants", response_model=List[RestaurantOut])
+async def get_restaurants(
+    limit: int = Query(100, ge=1, le=500),
+    after_id: int = Query(0, ge=0, le=INT4_MAX),
+    db: AsyncSession = Depends(get_db),
+):
+    key = (after_id, limit)
+    cached = restaurants_cache.get(key)
+    if cached is not None:
+        return cached
+    # RowMappings are dict-like and go straight to RestaurantOut; no per-row dicts
+    result = await db.execute(RESTAURANTS_STMT, {"after_id": after_id, "limit": limit})
+    data = result.mappings().all()
+    restaurants_cache[key] = data
+    return data
 
-@app.get("/menu/{restaurant_id}")
-def get_menu(restaurant_id: int):
-    db = SessionLocal()
-    try:
-        restaurant = db.query(Restaurant).filter(Restaurant.id == restaurant_id).first()
-        if not restaurant:
-            raise HTTPException(status_code=404, detail="Restaurant not found")
-        menu = []
-        for cat in restaurant.menu_categories:
-            items = [{"id": i.id, "name": i.name, "price": i.price} for i in cat.menu_items]
-            menu.append({"category": cat.name, "items": items})
-        return menu
-    finally:
-        db.close()
\ No newline at end of file
+@app.get("/menu/{restaurant_id}", response_model=List[MenuCategoryOut])
+async def get_menu(restaurant_id: int, db: AsyncSession = Depends(get_db)):
+    # No row can have an id outside int4, and binding one would fail in asyncpg
+    if not -INT4_MAX - 1 <= restaurant_id <= INT4_MAX:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+    cached = menu_cache.get(restaurant_id)
+    if cached is not None:
+        return cached
+    rows = (await db.execute(MENU_STMT, {"rid": restaurant_id})).all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+    groups = defaultdict(list)
+    for cid, cname, iid, iname, price in rows:
+        if cid is None:
+            continue
+        items = groups[(cid, cname)]
+        if iid is not None:
+            items.append({"id": iid, "name": iname, "price": price})
+    menu = [{"category": cname, "items": items} for (_, cname), items in groups.items()]
+    menu_cache[restaurant_id] = menu
+    return menu
\ No newline at end of file